@@ -0,0 +1,170 @@
+from http.client import HTTPConnection, HTTPSConnection, HTTPException
+from urllib.error import HTTPError
+from urllib.parse import urljoin, urlsplit
+from threading import Lock
+from random import uniform
+from time import monotonic, sleep
+import gzip
+import sys
+import zlib
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+# matches the agent urlopen sent, so sources see the same requests as before
+DEFAULT_HEADERS = {'User-Agent': f'Python-urllib/{sys.version_info.major}.{sys.version_info.minor}'}
+
+
+class HttpClient(object):
+    """Shared HTTP client that keeps pooled keep-alive connections to each host."""
+
+    def __init__(self, connect_timeout=5, read_timeout=15, retries=2, retry_budget=10, backoff=0.5, max_redirects=5, idle_timeout=5, headers=None):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.retry_budget = retry_budget
+        self.backoff = backoff
+        self.max_redirects = max_redirects
+        self.idle_timeout = idle_timeout
+        self.headers = dict(DEFAULT_HEADERS if headers is None else headers)
+        self.budget = retry_budget
+        self.pools = {}
+        self.lock = Lock()
+
+    def reset_budget(self):
+        """Restores the number of retries shared by all requests, call once per update."""
+        with self.lock:
+            self.budget = self.retry_budget
+
+    def close(self):
+        """Closes all idle pooled connections."""
+        with self.lock:
+            pools = self.pools
+            self.pools = {}
+
+        for pool in pools.values():
+            for conn, _ in pool:
+                conn.close()
+
+    def get(self, url: str, headers: dict = None) -> bytes:
+        """Requests the given URL, following redirects, and returns the decoded response body."""
+        for _ in range(self.max_redirects + 1):
+            status, response_headers, body = self._request(url, headers)
+            if status in REDIRECT_STATUSES and 'Location' in response_headers:
+                url = urljoin(url, response_headers['Location'])
+            elif status >= 400:
+                raise HTTPError(url, status, f'HTTP Error {status}', response_headers, None)
+            else:
+                return body
+
+        raise HTTPError(url, status, 'Too many redirects', response_headers, None)
+
+    def _request(self, url, headers):
+        """Makes a single request, retrying failed connections and busy servers with jittered backoff."""
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or '/'
+        if parts.query:
+            path += f'?{parts.query}'
+
+        headers = {**self.headers, 'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive', **(headers or {})}
+
+        attempt = 0
+        while True:
+            try:
+                status, response_headers, body = self._send(key, path, headers)
+            except (OSError, HTTPException):
+                if not self._can_retry(attempt):
+                    raise
+            else:
+                if status not in RETRY_STATUSES or not self._can_retry(attempt):
+                    return status, response_headers, decompress(body, response_headers.get('Content-Encoding', ''))
+
+            sleep(uniform(0, self.backoff * 2 ** attempt))
+            attempt += 1
+
+    def _send(self, key, path, headers):
+        """Sends a request and reads the response, moving to a new connection if a pooled one was dropped."""
+        reuse = True
+        while True:
+            conn, reused = self._acquire(key, reuse)
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                break
+            except TimeoutError:
+                conn.close()
+                raise
+            except (OSError, HTTPException):
+                conn.close()
+                # the server may have closed the idle connection before responding, that isn't a failure
+                if not reused:
+                    raise
+                reuse = False
+
+        try:
+            body = response.read()
+        except (OSError, HTTPException):
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(key, conn)
+
+        return response.status, response.headers, body
+
+    def _can_retry(self, attempt):
+        """Determines if another attempt is allowed, spending from the shared retry budget if so."""
+        with self.lock:
+            if attempt >= self.retries or self.budget <= 0:
+                return False
+
+            self.budget -= 1
+            return True
+
+    def _acquire(self, key, reuse=True):
+        """Takes a recently used connection to the host from the pool or opens a new one, returns if it was reused."""
+        stale = []
+        conn = None
+        with self.lock:
+            pool = self.pools.get(key, [])
+            while reuse and pool and conn is None:
+                idle, released = pool.pop()
+                if monotonic() - released < self.idle_timeout:
+                    conn = idle
+                else:
+                    stale.append(idle)
+
+        # servers drop idle keep-alive connections, so don't try to reuse old ones
+        for idle in stale:
+            idle.close()
+        if conn:
+            return conn, True
+
+        scheme, host, port = key
+        connection = HTTPSConnection if scheme == 'https' else HTTPConnection
+        conn = connection(host, port, timeout=self.connect_timeout)
+        conn.connect()
+        conn.sock.settimeout(self.read_timeout)
+        return conn, False
+
+    def _release(self, key, conn):
+        """Returns a connection to the pool for reuse."""
+        with self.lock:
+            self.pools.setdefault(key, []).append((conn, monotonic()))
+
+
+def decompress(body: bytes, encoding: str) -> bytes:
+    """Decodes a gzip or deflate compressed response body."""
+    encoding = encoding.strip().lower()
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    elif encoding == 'deflate':
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            # some servers send raw deflate data without the zlib header
+            return zlib.decompress(body, -zlib.MAX_WBITS)
+
+    return body
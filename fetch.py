@@ -1,14 +1,17 @@
-from urllib.request import urlopen, Request
 from urllib.error import HTTPError
 from bs4 import BeautifulSoup
 from datetime import datetime
 from dateutil import tz
 import json
 
+from client import HttpClient
 from races import YEAR, AnyRaces, Race
 
 HEADERS = {'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'}
 TIME_FORMAT = '%I:%M %p'
+CLIENT = HttpClient()
+# keys have no spaces because Race removes them from channels before normalization
+CHANNEL_ALIASES = {'USANet': 'USA', 'PrimeVideo': 'Prime'}
 
 
 def get_date_format(short_month=False, include_weekday=True, short_weekday=False):
@@ -57,15 +60,62 @@ def parse_date(date_str, out_tz, short_month=False, include_weekday=True, short_
     return dt
 
 
-def prevent_duplicates(name, previous_names):
-    """Appends a number after a given name if it is already in the provided list."""
-    i = 0
-    n = name
-    while n in previous_names:
-        i += 1
-        n = f'{name} {i}'
+def canonicalize_name(name):
+    """Removes footnote markers and redundant whitespace from a race name."""
+    return ' '.join(name.replace('*', '').replace('^', '').split())
 
-    return n
+
+def canonicalize_channel(channel):
+    """Replaces channel aliases with their common names and removes repeated channels."""
+    return ' '.join(dict.fromkeys(CHANNEL_ALIASES.get(ch, ch) for ch in channel.split()))
+
+
+def number_duplicates(races):
+    """Appends a number after each race name that was already used earlier in the list."""
+    seen = set()
+    counters = {}
+    for race in races:
+        name = race.name
+        if name in seen:
+            # resume counting from the last number used for this name
+            i = counters.get(name, 0)
+            n = name
+            while n in seen:
+                i += 1
+                n = f'{name} {i}'
+            counters[name] = i
+            race.name = n
+        seen.add(race.name)
+
+    return races
+
+
+def merge_duplicates(races):
+    """Combines consecutive listings sharing a name into the earliest one, keeping all of their channels."""
+    merged = []
+    for race in races:
+        if merged and merged[-1].name == race.name:
+            first = merged[-1]
+            first.time = min(first.time, race.time)
+            first.channel = canonicalize_channel(f'{first.channel} {race.channel}')
+        else:
+            merged.append(race)
+
+    return merged
+
+
+def normalize_races(races, duplicates='keep'):
+    """Canonicalizes names and channels of scraped races, then numbers or merges duplicate names."""
+    for race in races:
+        race.name = canonicalize_name(race.name)
+        race.channel = canonicalize_channel(race.channel)
+
+    if duplicates == 'number':
+        races = number_duplicates(races)
+    elif duplicates == 'merge':
+        races = merge_duplicates(races)
+
+    return races
 
 
 def process_espn_racing(ar: AnyRaces, key: str) -> list:
@@ -74,8 +124,7 @@ def process_espn_racing(ar: AnyRaces, key: str) -> list:
 
     # get rows of table
     series = ar.series[key]
-    page = urlopen(series.schedule_url)
-    html = page.read().decode('latin-1')
+    html = CLIENT.get(series.schedule_url).decode('latin-1')
     soup = BeautifulSoup(html, 'html.parser')
     rows = soup.table.find_all('tr')
     rows.pop(0)
@@ -119,10 +168,6 @@ def process_espn_racing(ar: AnyRaces, key: str) -> list:
                     tv = list(cells[2].strings)[0]
                     if tv is None:
                         tv = 'FOX'
-                    elif tv == 'USA Net':
-                        tv = 'USA'
-                    elif tv == 'Prime Video':
-                        tv = 'Prime'
                 else:
                     tv = ''
 
@@ -139,8 +184,7 @@ def process_espn_f1(ar: AnyRaces, key: str) -> list:
 
     # get rows of table
     series = ar.series[key]
-    page = urlopen(series.schedule_url)
-    html = page.read().decode('utf-8')
+    html = CLIENT.get(series.schedule_url).decode('utf-8')
     soup = BeautifulSoup(html, 'html.parser')
     rows = soup.tbody.find_all('tr')
 
@@ -175,9 +219,7 @@ def process_imsa(ar: AnyRaces, key: str) -> list:
 
     # get rows of table
     series = ar.series[key]
-    req = Request(series.schedule_url, headers=HEADERS)
-    page = urlopen(req)
-    html = page.read().decode('utf-8')
+    html = CLIENT.get(series.schedule_url, HEADERS).decode('utf-8')
     soup = BeautifulSoup(html, 'html.parser')
     rows = soup.find_all('div', class_='rich-text-component-container')
     rows.pop(0)
@@ -208,20 +250,6 @@ def process_imsa(ar: AnyRaces, key: str) -> list:
 
             races.append(Race(name, key, dt, tv))
 
-    # remove duplicate listings
-    remove = []
-    for i in range(len(races)):
-        if i + 1 < len(races):
-            a = races[i]
-            b = races[i+1]
-            if a.name == b.name:
-                remove.append(i)
-                b.time = a.time if a.time < b.time else b.time
-                b.channel = ' '.join(set(f'{a.channel} {b.channel}'.split()))
-
-    for i in sorted(remove, reverse=True):
-        del races[i]
-
     return races
 
 
@@ -231,13 +259,12 @@ def process_indy(ar: AnyRaces, key: str) -> list:
 
     # get rows of table
     series = ar.series[key]
-    page = urlopen(series.schedule_url)
-    html = page.read().decode('utf-8')
+    html = CLIENT.get(series.schedule_url).decode('utf-8')
     soup = BeautifulSoup(html, 'html.parser')
     items = soup.find('section', class_='card-repeater').find_all('div', class_='event-card')
 
     for item in items:
-        name = item.find('h3', class_='event-card-title').string.strip().replace('INDY NXT by Firestone at', '')
+        name = item.find('h3', class_='event-card-title').string.replace('INDY NXT by Firestone at', '')
         date = item.find('div', class_='event-card-header-date').string.strip()
         time = item.find('div', class_='event-card-header-time').string.strip()
         tv = item.find('div', class_='event-card-header-network').img['alt'].strip()
@@ -257,9 +284,7 @@ def process_arca(ar: AnyRaces, key: str) -> list:
 
     # get rows of table
     series = ar.series[key]
-    req = Request(series.schedule_url, headers=HEADERS)
-    page = urlopen(req)
-    html = page.read().decode('utf-8')
+    html = CLIENT.get(series.schedule_url, HEADERS).decode('utf-8')
     soup = BeautifulSoup(html, 'html.parser')
     rows = soup.table.find_all('tr')
     rows.pop(0)
@@ -281,7 +306,7 @@ def process_arca(ar: AnyRaces, key: str) -> list:
                 dt = parse_date(date, ar.time_zone)
 
             # use track as race name
-            race = prevent_duplicates(cells[1].string, [r.name for r in races])
+            race = cells[1].string
 
             tv = cells[4].string.split()[0]
             stream = cells[5].string
@@ -302,9 +327,7 @@ def process_nascar_ca(ar: AnyRaces, key: str) -> list:
 
     # get rows of table
     series = ar.series[key]
-    req = Request(series.schedule_url, headers=HEADERS)
-    page = urlopen(req)
-    html = page.read().decode('utf-8')
+    html = CLIENT.get(series.schedule_url, HEADERS).decode('utf-8')
     soup = BeautifulSoup(html, 'html.parser')
     rows = soup.table.find_all('tr')
     rows.pop(0)
@@ -319,7 +342,7 @@ def process_nascar_ca(ar: AnyRaces, key: str) -> list:
             dt = parse_date(f'{date} {time}', ar.time_zone, short_month=True)
 
             # use track as race name
-            race = prevent_duplicates(cells[0].find('div', 'race-name').string, [r.name for r in races])
+            race = cells[0].find('div', 'race-name').string
 
             races.append(Race(race, key, dt, 'FloRacing'))
 
@@ -332,9 +355,7 @@ def process_nascar_mod(ar: AnyRaces, key: str) -> list:
 
     # get rows of table
     series = ar.series[key]
-    req = Request(series.schedule_url, headers=HEADERS)
-    page = urlopen(req)
-    html = page.read().decode('utf-8')
+    html = CLIENT.get(series.schedule_url, HEADERS).decode('utf-8')
     soup = BeautifulSoup(html, 'html.parser')
     rows = soup.table.find_all('tr')
     rows.pop(0)
@@ -353,7 +374,7 @@ def process_nascar_mod(ar: AnyRaces, key: str) -> list:
                 dt = parse_date(date.replace('Sept', 'Sep'), ar.time_zone, short_month=True)
 
             # use track as race name
-            race = cells[0].find('span', 'race-name-span').string.replace('*', '').replace('^', '').strip()
+            race = cells[0].find('span', 'race-name-span').string
 
             races.append(Race(race, key, dt, 'FloRacing'))
 
@@ -369,8 +390,7 @@ def process_nascar_nationals(ar: AnyRaces, key: str) -> list:
     }
 
     series = ar.series[key]
-    page = urlopen(series.schedule_url)
-    data = json.load(page)
+    data = json.loads(CLIENT.get(series.schedule_url))
 
     if key not in series_tab or series_tab[key] not in data:
         return []
@@ -393,6 +413,7 @@ def process_nascar_nationals(ar: AnyRaces, key: str) -> list:
 def generate_races(ar, key):
     """Generate the list of races by processing data from the given URL."""
     races = []
+    duplicates = 'keep'
     schedule_url = ar.series[key].schedule_url
     if 'cf.nascar.com' in schedule_url:
         races = process_nascar_nationals(ar, key)
@@ -404,27 +425,35 @@ def generate_races(ar, key):
         races = process_indy(ar, key)
     elif 'imsa.com' in schedule_url:
         races = process_imsa(ar, key)
+        duplicates = 'merge'
     elif 'arcaracing.com' in schedule_url:
         races = process_arca(ar, key)
+        duplicates = 'number'
     elif 'nascar.ca' in schedule_url:
         races = process_nascar_ca(ar, key)
+        duplicates = 'number'
     elif 'nascar.com' in schedule_url and 'modified' in schedule_url:
         races = process_nascar_mod(ar, key)
 
-    return races
+    return normalize_races(races, duplicates)
 
 
 def fetch_races(ar):
     # build a list of races from each series
+    CLIENT.reset_budget()
     races = []
-    for k in ar.series:
-        name = ar.series[k].name
-        try:
-            races.extend(generate_races(ar, k))
-        except HTTPError:
-            print(f'Unable to fetch {name}')
-        except Exception as e:
-            print(f'Unable to scrape {name}:', e)
+    try:
+        for k in ar.series:
+            name = ar.series[k].name
+            try:
+                races.extend(generate_races(ar, k))
+            except HTTPError:
+                print(f'Unable to fetch {name}')
+            except Exception as e:
+                print(f'Unable to scrape {name}:', e)
+    finally:
+        # updates are hours apart, so pooled connections would only expire before the next one
+        CLIENT.close()
 
     print('Fetched', len(races), 'total races')
     return races
@@ -433,13 +462,22 @@ def fetch_races(ar):
 def merge_races(old_races, new_races):
     # merge with the existing races
     merged_races = new_races.copy()
+
+    # key on cleaned names so races cached before names were canonicalized are replaced, not restored
+    def race_key(race):
+        return race.series, race.time.month, canonicalize_name(race.name)
+
+    new_by_key = {}
+    for race in new_races:
+        new_by_key.setdefault(race_key(race), race)
+
     for race in old_races:
-        matches = [r for r in new_races if r == race]
-        if not matches:
+        match = new_by_key.get(race_key(race))
+        if match is None:
             merged_races.append(race)
             print('Restoring', race.series, race.name)
-        elif matches[0].time != race.time:
-            print(race.series, race.name, 'updated from', race.time, 'to', matches[0].time)
+        elif match.time != race.time:
+            print(race.series, race.name, 'updated from', race.time, 'to', match.time)
 
     print('Merged into', len(merged_races), 'total races')
     return merged_races
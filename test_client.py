@@ -0,0 +1,137 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from threading import Thread
+from time import sleep
+import gzip
+import unittest
+import zlib
+
+from client import HttpClient
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves canned responses for each path and records what the client sent."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def respond(self, status, body=b'', headers={}):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        server.ports.add(self.client_address[1])
+        server.agents.append(self.headers['User-Agent'])
+        server.hits[self.path] = server.hits.get(self.path, 0) + 1
+
+        if self.path == '/plain':
+            self.respond(200, b'plain')
+        elif self.path == '/gzip':
+            self.respond(200, gzip.compress(b'gzipped'), {'Content-Encoding': 'gzip'})
+        elif self.path == '/deflate':
+            self.respond(200, zlib.compress(b'deflated'), {'Content-Encoding': 'deflate'})
+        elif self.path == '/redirect':
+            self.respond(302, headers={'Location': '/plain'})
+        elif self.path == '/busy':
+            # fail with a 503 once, then succeed
+            self.respond(503 if server.hits[self.path] == 1 else 200, b'recovered')
+        elif self.path == '/down':
+            self.respond(503)
+        elif self.path == '/slow':
+            sleep(1)
+            self.respond(200, b'late')
+        elif self.path == '/drop':
+            # answer, then drop the connection without telling the client, like an idle timeout would
+            self.respond(200, b'dropped')
+            self.close_connection = True
+        else:
+            self.respond(404)
+
+
+class TestHttpClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        self.server.ports = set()
+        self.server.agents = []
+        self.server.hits = {}
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        self.client = HttpClient(read_timeout=0.5, backoff=0.01)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuses_connection(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get(f'{self.url}/plain'), b'plain')
+        self.assertEqual(len(self.server.ports), 1)
+
+    def test_decompresses(self):
+        self.assertEqual(self.client.get(f'{self.url}/gzip'), b'gzipped')
+        self.assertEqual(self.client.get(f'{self.url}/deflate'), b'deflated')
+
+    def test_follows_redirects(self):
+        self.assertEqual(self.client.get(f'{self.url}/redirect'), b'plain')
+
+    def test_sends_user_agent(self):
+        self.client.get(f'{self.url}/plain')
+        self.client.get(f'{self.url}/plain', {'User-Agent': 'custom'})
+        self.assertTrue(self.server.agents[0].startswith('Python-urllib/'))
+        self.assertEqual(self.server.agents[1], 'custom')
+
+    def test_default_headers_are_not_shared(self):
+        self.client.headers['User-Agent'] = 'changed'
+        self.assertTrue(HttpClient().headers['User-Agent'].startswith('Python-urllib/'))
+
+    def test_raises_http_errors(self):
+        with self.assertRaises(HTTPError) as e:
+            self.client.get(f'{self.url}/missing')
+        self.assertEqual(e.exception.code, 404)
+
+    def test_retries_busy_server(self):
+        self.assertEqual(self.client.get(f'{self.url}/busy'), b'recovered')
+        self.assertEqual(self.client.budget, self.client.retry_budget - 1)
+
+    def test_retry_budget_is_bounded(self):
+        client = HttpClient(retries=5, retry_budget=2, backoff=0.01)
+        with self.assertRaises(HTTPError):
+            client.get(f'{self.url}/down')
+        self.assertEqual(self.server.hits['/down'], 3)
+        self.assertEqual(client.budget, 0)
+
+        # an exhausted budget means no more retries until it is reset
+        with self.assertRaises(HTTPError):
+            client.get(f'{self.url}/down')
+        self.assertEqual(self.server.hits['/down'], 4)
+
+        client.reset_budget()
+        self.assertEqual(client.budget, 2)
+        client.close()
+
+    def test_read_timeout(self):
+        client = HttpClient(read_timeout=0.2, retries=0)
+        with self.assertRaises(TimeoutError):
+            client.get(f'{self.url}/slow')
+        client.close()
+
+    def test_dropped_connection_is_free_retry(self):
+        client = HttpClient(retry_budget=0, backoff=10)
+        self.assertEqual(client.get(f'{self.url}/drop'), b'dropped')
+        sleep(0.1)
+        self.assertEqual(client.get(f'{self.url}/plain'), b'plain')
+        self.assertEqual(len(self.server.ports), 2)
+        client.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+from datetime import datetime
+import unittest
+
+from fetch import canonicalize_name, canonicalize_channel, merge_races, normalize_races
+from races import Race
+
+
+def race(name, channel='FS1', day=1, month=3, series='ARCA'):
+    return Race(name, series, datetime(2025, month, day, 12), channel)
+
+
+class TestNormalizeRaces(unittest.TestCase):
+
+    def test_canonicalize_name(self):
+        self.assertEqual(canonicalize_name(' Barber  Motorsports Park*^ '), 'Barber Motorsports Park')
+
+    def test_canonicalize_channel(self):
+        self.assertEqual(canonicalize_channel('USANet PrimeVideo USA FS1'), 'USA Prime FS1')
+
+    def test_channel_aliases_after_race_removes_spaces(self):
+        races = normalize_races([race('Daytona', 'USA Net'), race('Talladega', 'Prime Video')])
+        self.assertEqual([r.channel for r in races], ['USA', 'Prime'])
+
+    def test_keeps_duplicates_by_default(self):
+        races = normalize_races([race('Daytona'), race('Daytona')])
+        self.assertEqual([r.name for r in races], ['Daytona', 'Daytona'])
+
+    def test_numbers_duplicates(self):
+        races = normalize_races([race('X'), race('X'), race('X 1'), race('X')], 'number')
+        self.assertEqual([r.name for r in races], ['X', 'X 1', 'X 1 1', 'X 2'])
+
+    def test_merges_adjacent_duplicates(self):
+        races = normalize_races([
+            race('Rolex 24', 'NBC', day=2),
+            race('Rolex 24', 'Peacock', day=1),
+            race('Rolex 24', 'NBC', day=3),
+            race('Sebring', 'USA', day=15),
+            race('Rolex 24', 'IMSAtv', day=20),
+        ], 'merge')
+
+        self.assertEqual([r.name for r in races], ['Rolex 24', 'Sebring', 'Rolex 24'])
+        self.assertEqual(races[0].time.day, 1)
+        self.assertEqual(races[0].channel, 'NBC Peacock')
+        self.assertEqual(races[2].channel, 'IMSAtv')
+
+
+class TestMergeRaces(unittest.TestCase):
+
+    def test_replaces_cached_races_with_old_names(self):
+        old = [race(' Barber*'), race('Road America', month=6)]
+        new = normalize_races([race(' Barber')])
+        merged = merge_races(old, new)
+        self.assertEqual([r.name for r in merged], ['Barber', 'Road America'])
+
+
+if __name__ == '__main__':
+    unittest.main()